@@ -0,0 +1,331 @@
+"""Tests for tools/wrappers.py.
+
+Every test case runs against the generated pure-Python wrappers and,
+when tools/_wrappers.pyx is built, against the compiled _WrapWithCalls.
+"""
+
+import os
+import sys
+import copy
+import pickle
+import operator
+import functools
+import unittest
+
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
+
+import wrappers
+
+_COMPILED = wrappers._WrapWithCalls
+
+
+def target(*args, **kwds):
+    return ('target', args, kwds)
+
+
+# hook names called by PurePythonWrappersTest.call_chain()
+ALL_CALLS = ['a', 'b', 'fn', 'target', 'fn', 'c']
+# results 7, 13, 14, 12, 14, 15 of call_chain() hooks reduced
+REDUCED = (
+    (operator.add, 75),
+    (operator.mul, 3210480),
+    (operator.and_, 4),
+    (operator.or_, 15),
+    (operator.xor, 9),
+    (max, 15),
+    (min, 7),
+    (lambda x, y: (x, y), (((((7, 13), 14), 12), 14), 15)),
+)
+
+
+class PurePythonWrappersTest(unittest.TestCase):
+    wrap_with_calls_impl = None
+
+    def setUp(self):
+        self._saved_impl = wrappers._WrapWithCalls
+        wrappers._WrapWithCalls = self.wrap_with_calls_impl
+
+    def tearDown(self):
+        wrappers._WrapWithCalls = self._saved_impl
+
+    def test_pickle_by_reference(self):
+        decorated = wrappers.call_before(print, 'pre')(target)
+        self.addCleanup(setattr, sys.modules[__name__], 'target', target)
+        globals()['target'] = decorated
+        self.assertIs(pickle.loads(pickle.dumps(decorated)), decorated)
+        self.assertIs(copy.deepcopy(decorated), decorated)
+        self.assertIs(copy.copy(decorated), decorated)
+
+    def test_copy_without_qualname(self):
+        class CallableObject:
+            def __call__(self, *args, **kwds):
+                return target(*args, **kwds)
+
+        for decorated_func in (functools.partial(target, 1),
+                               CallableObject()):
+            with self.subTest(decorated_func=decorated_func):
+                decorated = wrappers.call_before(print)(decorated_func)
+                self.assertIs(copy.copy(decorated), decorated)
+                self.assertIs(copy.deepcopy(decorated), decorated)
+                self.assertIs(copy.deepcopy({'f': decorated})['f'],
+                              decorated)
+                with self.assertRaises((pickle.PicklingError,
+                                        AttributeError)):
+                    pickle.dumps(decorated)
+
+    def test_kwds_passed_live(self):
+        calls = []
+        kwds = {'x': 1}
+        decorated = wrappers.call_before(
+            lambda *a, **k: calls.append(k), kwds=kwds)(target)
+        kwds['x'] = 2
+        decorated()
+        self.assertEqual(calls, [{'x': 2}])
+
+    def test_kwds_mapping(self):
+        calls = []
+        decorated = wrappers.call_after(
+            lambda *a, **k: calls.append((a, k)),
+            1,
+            kwds=MappingProxyType({'x': 1}),
+        )(target)
+        self.assertEqual(decorated(2), ('target', (2,), {}))
+        self.assertEqual(calls, [((1,), {'x': 1})])
+
+    def test_bare_decorator_keeps_func_metadata(self):
+        calls = []
+
+        @wrappers.wrap_with_calls
+        def hook():
+            "hook doc"
+            calls.append('hook')
+
+        self.assertEqual(hook.__name__, 'hook')
+        self.assertEqual(hook.__doc__, 'hook doc')
+        self.assertTrue(callable(hook.__wrapped__))
+        decorated = hook(target)
+        self.assertEqual(decorated.__name__, 'target')
+        self.assertEqual(decorated(1), ('target', (1,), {}))
+        self.assertEqual(calls, ['hook', 'hook'])
+
+    def call_chain(self, **kwds):
+        """Call a fixed hook chain, return result and hook names called."""
+        calls = []
+
+        def hook(name, value):
+            def hook_func(*args, **kwds):
+                calls.append(name)
+                return value
+            return hook_func
+
+        decorated = wrappers.wrap_with_calls(
+            hook('fn', 14),
+            first_call=[hook('a', 7), hook('b', 13)],
+            after_call=hook('c', 15),
+            **kwds,
+        )(hook('target', 12))
+        return decorated(), calls
+
+    def test_hooks(self):
+        self.assertEqual(self.call_chain(), (12, ALL_CALLS))
+
+    def test_filter(self):
+        for value, expected in ((14, (14, ['a', 'b', 'fn'])),
+                                (15, (15, ALL_CALLS)),
+                                # decorated_func result is not filtered
+                                (12, (12, ALL_CALLS)),
+                                (0, (12, ALL_CALLS))):
+            with self.subTest(value=value):
+                self.assertEqual(self.call_chain(
+                    return_filter_func=lambda result: result == value,
+                ), expected)
+
+    def test_reduce(self):
+        for reducer, expected in REDUCED:
+            with self.subTest(reducer=reducer):
+                self.assertEqual(self.call_chain(
+                    reduce_result_func=reducer,
+                ), (expected, ALL_CALLS))
+
+    def test_filter_and_reduce(self):
+        for reducer, expected in REDUCED:
+            with self.subTest(reducer=reducer):
+                self.assertEqual(self.call_chain(
+                    return_filter_func=lambda result: result == 14,
+                    reduce_result_func=reducer,
+                ), (14, ['a', 'b', 'fn']))
+                self.assertEqual(self.call_chain(
+                    return_filter_func=lambda result: result == 12,
+                    reduce_result_func=reducer,
+                ), (expected, ALL_CALLS))
+
+    def test_reduce_ties(self):
+        # max and min keep the first of equal results
+        for reducer in (max, min):
+            with self.subTest(reducer=reducer):
+                result = wrappers.call_before(
+                    lambda: 1, reduce_result_func=reducer,
+                )(lambda: 1.0)()
+                self.assertIs(type(result), int)
+
+    def test_reduce_errors(self):
+        for reducer in (operator.add, max, min):
+            with self.subTest(reducer=reducer):
+                calls = []
+                decorated = wrappers.wrap_with_calls(
+                    lambda: calls.append('fn') or 9,
+                    reduce_result_func=reducer,
+                )(lambda: calls.append('target') or 'T')
+                self.assertRaises(TypeError, decorated)
+                self.assertEqual(calls, ['fn', 'target'])
+
+    def test_many_hooks_and_args(self):
+        calls = []
+
+        def hook(name):
+            def hook_func(*args, **kwds):
+                calls.append((name, args, kwds))
+                return len(calls)
+            return hook_func
+
+        args = tuple(range(12))
+        decorated = wrappers.wrap_with_calls(
+            hook('fn'), *args,
+            first_call=[hook(f'f{i}') for i in range(10)],
+            after_call=[hook(f'g{i}') for i in range(10)],
+            args=args,
+            kwds={'k': 1},
+            reduce_result_func=operator.add,
+        )(lambda x: x)
+        self.assertEqual(decorated(0), sum(range(1, 23)))
+        self.assertEqual(
+            [name for name, _, _ in calls],
+            [*(f'f{i}' for i in range(10)), 'fn', 'fn',
+             *(f'g{i}' for i in range(10))],
+        )
+        for name, call_args, call_kwds in calls:
+            self.assertEqual(call_args, args * 2 if name == 'fn' else args)
+            self.assertEqual(call_kwds, {'k': 1})
+
+
+class GeneratedWrappersTest(unittest.TestCase):
+    """Code generation details of the pure-Python wrappers."""
+
+    def setUp(self):
+        self.addCleanup(setattr, wrappers, '_WrapWithCalls',
+                        wrappers._WrapWithCalls)
+        wrappers._WrapWithCalls = None
+
+    def test_wrapper_code_is_shared(self):
+        wrappers._wrapper_factory.cache_clear()
+        self.addCleanup(wrappers._wrapper_factory.cache_clear)
+        for n_args in range(wrappers._UNROLL_MAX + 1, 100):
+            wrappers.call_before(print, *range(n_args))(target)
+        for n_hooks in range(wrappers._UNROLL_MAX + 1, 100):
+            wrappers.call_after([print] * n_hooks)(target)
+        self.assertEqual(wrappers._wrapper_factory.cache_info().currsize, 2)
+
+
+@unittest.skipIf(_COMPILED is None, '_wrappers extension is not built')
+class CompiledWrappersTest(PurePythonWrappersTest):
+    wrap_with_calls_impl = _COMPILED
+
+
+@unittest.skipIf(_COMPILED is None, '_wrappers extension is not built')
+class EquivalenceTest(unittest.TestCase):
+    """Generated and compiled wrappers give the same results."""
+
+    def run_both(self, make_decorator, *args, **kwds):
+        outcomes = []
+        for impl in (None, _COMPILED):
+            calls = []
+
+            def hook(name, value):
+                def hook_func(*a, **k):
+                    calls.append((name, a, k))
+                    return value
+                return hook_func
+
+            def decorated_func(*a, **k):
+                calls.append(('target', a, k))
+                return 'T'
+
+            saved_impl = wrappers._WrapWithCalls
+            wrappers._WrapWithCalls = impl
+            try:
+                wrapped = make_decorator(hook)(decorated_func)
+            finally:
+                wrappers._WrapWithCalls = saved_impl
+            try:
+                result = wrapped(*args, **kwds)
+            except Exception as exc:
+                result = type(exc)
+            outcomes.append((result, calls))
+        self.assertEqual(outcomes[0], outcomes[1])
+        return outcomes[0]
+
+    def test_hooks(self):
+        self.run_both(lambda hook: wrappers.wrap_with_calls(
+            hook('func', 0), 10, 11,
+            first_call=[hook('a', 1), 'not callable', hook('b', 2)],
+            after_call=hook('c', 3),
+            args=(1,),
+            kwds={'z': 9},
+        ), 5, q=6)
+
+    def test_filter(self):
+        result, _ = self.run_both(lambda hook: wrappers.wrap_with_calls(
+            first_call=[hook('a', 1), hook('b', 2)],
+            after_call=hook('c', 3),
+            return_filter_func=lambda value: value == 2,
+        ))
+        self.assertEqual(result, 2)
+
+    def test_reduce(self):
+        for reducer in (operator.add, max, min,
+                        lambda x, y: (x, y)):
+            with self.subTest(reducer=reducer):
+                self.run_both(lambda hook: wrappers.wrap_with_calls(
+                    first_call=[hook('a', 'p'), hook('b', 'r')],
+                    after_call=hook('c', 'q'),
+                    reduce_result_func=reducer,
+                ))
+
+    def test_filter_and_reduce(self):
+        self.run_both(lambda hook: wrappers.wrap_with_calls(
+            hook('func', 4),
+            first_call=hook('a', 1),
+            after_call=hook('c', 3),
+            return_filter_func=lambda value: value == 3,
+            reduce_result_func=operator.add,
+        ))
+
+    def test_errors(self):
+        result, _ = self.run_both(lambda hook: wrappers.wrap_with_calls(
+            first_call=[hook('a', 1), hook('b', 'x')],
+            reduce_result_func=operator.add,
+        ))
+        self.assertIs(result, TypeError)
+        for reducer in (max, min):
+            with self.subTest(reducer=reducer):
+                result, calls = self.run_both(
+                    lambda hook: wrappers.wrap_with_calls(
+                        hook('func', 9),
+                        reduce_result_func=reducer,
+                    ))
+                self.assertIs(result, TypeError)
+                self.assertEqual([call[0] for call in calls],
+                                 ['func', 'target'])
+
+    def test_helpers(self):
+        self.run_both(lambda hook: wrappers.wrap_with(
+            hook('before', 1), hook('after', 2), 7, args=(8,), kwds={'k': 1}))
+        self.run_both(lambda hook: wrappers.call_before(hook('before', 1), 7))
+        self.run_both(lambda hook: wrappers.call_after(
+            hook('after', 2), kwds={'k': 2}))
+
+
+if __name__ == '__main__':
+    unittest.main()
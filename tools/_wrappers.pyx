@@ -0,0 +1,225 @@
+# cython: language_level=3
+# -*- coding = utf-8 -*-
+"""Compiled call chain for wrappers.wrap_with_calls.
+
+Optional speedup, build in place with:
+    cythonize -i tools/_wrappers.pyx
+wrappers.py falls back to generated pure-Python wrappers
+when this module is not available. Both must behave the same,
+tests/test_wrappers.py compares them when this module is built:
+    python -m unittest discover -s tests
+"""
+
+from cpython.dict cimport PyDict_CheckExact
+from cpython.object cimport PyObject, PyObject_Call
+
+import pickle
+import functools
+import types
+
+cdef extern from *:
+    """
+    #if PY_VERSION_HEX < 0x03090000
+    #define PyObject_Vectorcall _PyObject_Vectorcall
+    #define Py_TPFLAGS_HAVE_VECTORCALL _Py_TPFLAGS_HAVE_VECTORCALL
+    #endif
+
+    /* positional vectorcall with arguments taken from tuple items */
+    static PyObject *_wwc_call_vector(PyObject *callable, PyObject *args)
+    {
+        return PyObject_Vectorcall(
+            callable, PySequence_Fast_ITEMS(args),
+            (size_t)PyTuple_GET_SIZE(args), NULL);
+    }
+
+    /* Cython does not fill tp_vectorcall_offset for cdef classes */
+    static void _wwc_enable_vectorcall(PyObject *type, Py_ssize_t offset)
+    {
+        ((PyTypeObject *)type)->tp_vectorcall_offset = offset;
+        ((PyTypeObject *)type)->tp_flags |= Py_TPFLAGS_HAVE_VECTORCALL;
+    }
+    """
+    ctypedef PyObject *(*vectorcallfunc)(
+        PyObject *callable,
+        PyObject **args,
+        size_t nargsf,
+        PyObject *kwnames,
+    )
+    object PyObject_Vectorcall(
+        object callable,
+        PyObject **args,
+        size_t nargsf,
+        PyObject *kwnames,
+    )
+    object _wwc_call_vector(object callable, tuple args)
+    void _wwc_enable_vectorcall(object type, Py_ssize_t offset)
+
+
+cdef class _WrapWithCalls:
+    """Decorated function wrapper with prepared call chain.
+
+    Every step of _before and _after is a (callable, args) pair,
+    called with the keyword arguments _kwds, the mapping given
+    to wrap_with_calls itself (None if there are no keywords
+    to pass). Without keywords hooks are called with vectorcall
+    over the prepared args tuple.
+    The wrapper itself supports vectorcall as well.
+    """
+    cdef vectorcallfunc _vectorcall
+    cdef object _df
+    cdef tuple _before
+    cdef tuple _after
+    cdef object _kwds
+    cdef bint _kwds_is_dict
+    cdef object _filter
+    cdef object _reduce
+    cdef dict __dict__
+    cdef object __weakref__
+
+    def __cinit__(self):
+        self._vectorcall = <vectorcallfunc>_wrap_with_calls_vectorcall
+
+    def __init__(
+        self,
+        decorated_func,
+        tuple first,
+        func,
+        tuple func_args,
+        tuple after,
+        tuple args,
+        kwds,
+        return_filter_func,
+        reduce_result_func,
+    ):
+        func_steps = () if func is None else ((func, func_args),)
+        self._df = decorated_func
+        self._before = (*((item, args) for item in first), *func_steps)
+        self._after = (*func_steps, *((item, args) for item in after))
+        # no copy here: later changes of kwds reach the hooks,
+        # as with **kwds in the pure-Python wrapper
+        self._kwds = kwds if kwds else None
+        self._kwds_is_dict = PyDict_CheckExact(kwds)
+        self._filter = return_filter_func
+        self._reduce = reduce_result_func
+        functools.update_wrapper(self, decorated_func)
+
+    def __reduce__(self):
+        # pickled by reference to the module global,
+        # like the plain function it replaces
+        qualname = getattr(self, '__qualname__', None)
+        if qualname is None:
+            raise pickle.PicklingError(
+                f"Can't pickle {self!r}: "
+                'decorated callable has no __qualname__'
+            )
+        return qualname
+
+    def __copy__(self):
+        # copied as is, like the plain function it replaces
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __get__(self, instance, owner):
+        # bind like a plain function when used on methods
+        if instance is None:
+            return self
+        return types.MethodType(self, instance)
+
+    cdef inline object _call_step(self, tuple step):
+        if self._kwds is None:
+            return _wwc_call_vector(step[0], step[1])
+        if self._kwds_is_dict:
+            return PyObject_Call(step[0], step[1], self._kwds)
+        # other mappings are accepted by ** in the pure-Python wrapper
+        return PyObject_Call(step[0], step[1], dict(self._kwds))
+
+    cdef inline object _call_df(
+        self,
+        tuple call_args,
+        dict call_kwds,
+        PyObject **vargs,
+        size_t nargsf,
+        PyObject *kwnames,
+    ):
+        # call_args is None when called through vectorcall
+        if call_args is None:
+            return PyObject_Vectorcall(self._df, vargs, nargsf, kwnames)
+        return PyObject_Call(self._df, call_args, call_kwds)
+
+    cdef object _call_chain(
+        self,
+        tuple call_args,
+        dict call_kwds,
+        PyObject **vargs,
+        size_t nargsf,
+        PyObject *kwnames,
+    ):
+        cdef tuple step
+        cdef object cur_result
+        cdef object acc = None
+        cdef bint has_acc = False
+        cdef object _filter = self._filter
+        cdef object _reduce = self._reduce
+
+        if _filter is None and _reduce is None:
+            # plain hooks, their results are not needed
+            for step in self._before:
+                self._call_step(step)
+            decorated_func_result = self._call_df(
+                call_args, call_kwds, vargs, nargsf, kwnames)
+            for step in self._after:
+                self._call_step(step)
+            return decorated_func_result
+
+        # first calls and func before decorated_func
+        for step in self._before:
+            cur_result = self._call_step(step)
+            if _filter is not None and _filter(cur_result):
+                return cur_result
+            if _reduce is not None:
+                acc = _reduce(acc, cur_result) if has_acc else cur_result
+                has_acc = True
+
+        # !!! decorated_func call !!!
+        decorated_func_result = self._call_df(
+            call_args, call_kwds, vargs, nargsf, kwnames)
+        if _reduce is not None:
+            acc = (_reduce(acc, decorated_func_result) if has_acc
+                   else decorated_func_result)
+            has_acc = True
+
+        # func after decorated_func and after calls
+        for step in self._after:
+            cur_result = self._call_step(step)
+            if _filter is not None and _filter(cur_result):
+                return cur_result
+            if _reduce is not None:
+                acc = _reduce(acc, cur_result)
+
+        if _reduce is not None:
+            return acc
+        return decorated_func_result
+
+    def __call__(self, *decorated_func_args, **decorated_func_kwds):
+        return self._call_chain(
+            decorated_func_args, decorated_func_kwds, NULL, 0, NULL)
+
+
+cdef object _wrap_with_calls_vectorcall(
+    _WrapWithCalls self,
+    PyObject **args,
+    size_t nargsf,
+    PyObject *kwnames,
+):
+    # arguments are forwarded to decorated_func as they came
+    return self._call_chain(None, None, args, nargsf, kwnames)
+
+
+cdef _WrapWithCalls _probe = _WrapWithCalls.__new__(_WrapWithCalls)
+_wwc_enable_vectorcall(
+    _WrapWithCalls,
+    <char *>&_probe._vectorcall - <char *><PyObject *>_probe,
+)
+_probe = None
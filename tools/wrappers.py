@@ -16,10 +16,26 @@ __all__ = [
 
 import time
 import logging
+import operator
+import textwrap
 import functools
 
+from types import MappingProxyType
 from typing import Callable
 
+try:
+    # optional compiled call chain, see _wrappers.pyx
+    if __package__:
+        from ._wrappers import _WrapWithCalls
+    else:
+        from _wrappers import _WrapWithCalls
+except ImportError:
+    _WrapWithCalls = None
+
+# shared empty defaults for args and kwds (read-only for kwds)
+_EMPTY_TUPLE = ()
+_EMPTY_DICT_FROZEN = MappingProxyType({})
+
 def log_perf_counter(
     param = None,
     /,
@@ -121,6 +137,199 @@ def log_perf_counter(
     return decorator(param)
 
 
+def _return_unchanged(decorated_func):
+    """Decorator for wrap_with_calls with nothing to wrap."""
+    return decorated_func
+
+
+# Source templates for wrappers generated by wrap_with_calls.
+# One hook call is rendered by the template selected with
+# (return_filter_func given, reduce_result_func given),
+# {call} is the hook call expression, {acc} is the accumulator update
+# rendered by _acc_source().
+_HOOK_TEMPLATES = {
+    (False, False): (
+        '    {call}\n'
+    ),
+    (True, False): (
+        '    r = {call}\n'
+        '    if _flt(r):\n'
+        '        return r\n'
+    ),
+    (False, True): (
+        '    {acc}\n'
+    ),
+    (True, True): (
+        '    r = {call}\n'
+        '    if _flt(r):\n'
+        '        return r\n'
+        '    {acc}\n'
+    ),
+}
+# Common reduce_result_func values rendered without a call per result:
+# binary operators are inlined into the accumulator update,
+# max and min into a comparison of the result with the accumulator.
+_INLINE_REDUCERS = (
+    (operator.add, '+'),
+    (operator.mul, '*'),
+    (operator.and_, '&'),
+    (operator.or_, '|'),
+    (operator.xor, '^'),
+    (max, '>'),
+    (min, '<'),
+)
+
+
+# Hooks and positional arguments up to this count are unrolled
+# in generated wrappers, longer ones are looped over and unpacked.
+_UNROLL_MAX = 8
+
+
+def _shape_len(items):
+    """Length of items in a _wrapper_factory shape, None if not unrolled."""
+    return len(items) if len(items) <= _UNROLL_MAX else None
+
+
+def _acc_source(index, value, reduce_op):
+    """Source of the accumulator update for the index-th result."""
+    if not index:
+        return f'acc = {value}'
+    if reduce_op is None:
+        return f'acc = _rdc(acc, {value})'
+    if reduce_op in ('>', '<'):
+        # as in max(acc, value) and min(acc, value): acc wins ties
+        if not value.isidentifier():
+            return f'acc = r if (r := {value}) {reduce_op} acc else acc'
+        return f'acc = {value} if {value} {reduce_op} acc else acc'
+    return f'acc = acc {reduce_op} {value}'
+
+
+def _call_source(name, args_name, n_args, with_kwds):
+    """Source of a hook call with positional arguments unrolled
+    (unpacked from the args tuple if n_args is None)."""
+    if n_args is None:
+        params = [f'*_{args_name}']
+    else:
+        params = [f'_{args_name}{index}' for index in range(n_args)]
+    if with_kwds:
+        params.append('**_K')
+    return '%s(%s)' % (name, ', '.join(params))
+
+
+@functools.lru_cache(maxsize=256)
+def _wrapper_factory(
+    n_first,
+    with_func,
+    n_after,
+    n_args,
+    n_func_args,
+    with_kwds,
+    with_filter,
+    with_reduce,
+    reduce_op,
+):
+    """Build wrapper factory specialized for one wrap_with_calls shape.
+    
+    Hooks are unrolled into calls of f0.., fn, g0.. with positional
+    arguments A0.. (FA0.. for fn) spelled out, so hooks are called
+    without argument unpacking unless keywords K have to be passed.
+    Counts above _UNROLL_MAX are given as None (see _shape_len):
+    then f0 is followed by a loop over the other first hooks F,
+    after hooks are looped over as G and arguments unpacked from A
+    (FA for fn), so the wrapper source stays small for any shape.
+    reduce_op is the _INLINE_REDUCERS entry for rdc, if any.
+    
+    Returns (factory, bound): factory(df, *values) creates the wrapper
+    with df and values for the names listed in bound (hooks, A*, FA*,
+    K, flt, rdc) held in its closure cells ('_' prefixed).
+    """
+    hook = _HOOK_TEMPLATES[with_filter, with_reduce]
+    # steps are hook call sources, (hooks name, call source) for
+    # a loop over hooks and None for the decorated_func call
+    if n_first is None:
+        steps = [_call_source('_f0', 'A', n_args, with_kwds),
+                 ('F', _call_source('h', 'A', n_args, with_kwds))]
+    else:
+        steps = [_call_source(f'_f{index}', 'A', n_args, with_kwds)
+                 for index in range(n_first)]
+    if with_func:
+        steps.append(_call_source('_fn', 'FA', n_func_args, with_kwds))
+    steps.append(None) # decorated_func call
+    if with_func:
+        steps.append(_call_source('_fn', 'FA', n_func_args, with_kwds))
+    if n_after is None:
+        steps.append(('G', _call_source('h', 'A', n_args, with_kwds)))
+    else:
+        steps.extend(_call_source(f'_g{index}', 'A', n_args, with_kwds)
+                     for index in range(n_after))
+    
+    if n_first is None:
+        bound = ['f0', 'F']
+    else:
+        bound = [f'f{index}' for index in range(n_first)]
+    if n_after is None:
+        bound.append('G')
+    else:
+        bound.extend(f'g{index}' for index in range(n_after))
+    if with_func:
+        bound.append('fn')
+        if n_func_args is None:
+            bound.append('FA')
+        else:
+            bound.extend(f'FA{index}' for index in range(n_func_args))
+    if n_args is None:
+        bound.append('A')
+    else:
+        bound.extend(f'A{index}' for index in range(n_args))
+    if with_kwds:
+        bound.append('K')
+    if with_filter:
+        bound.append('flt')
+    if with_reduce and reduce_op is None:
+        bound.append('rdc')
+    
+    src = []
+    for index, call in enumerate(steps):
+        if call is None:
+            src.append('    res = _df(*a, **k)\n')
+            if with_reduce:
+                src.append('    %s\n' % _acc_source(index, 'res', reduce_op))
+            continue
+        hooks = None
+        if isinstance(call, tuple):
+            hooks, call = call
+        # without filter the call result is folded directly
+        value = 'r' if with_filter else call
+        call_src = hook.format(
+            call=call,
+            acc=_acc_source(index, value, reduce_op),
+        )
+        if hooks is not None:
+            # never the first step, acc is already set
+            call_src = '    for h in _%s:\n%s' % (
+                hooks,
+                textwrap.indent(call_src, '    '),
+            )
+        src.append(call_src)
+    if with_reduce:
+        src.append('    return acc\n')
+    else:
+        src.append('    return res\n')
+    
+    factory_src = (
+        'def make_decorated_func_wrapper(%s):\n'
+        '    def decorated_func_wrapper(*a, **k):\n'
+        '%s'
+        '    return decorated_func_wrapper\n'
+    ) % (
+        ', '.join(f'_{name}' for name in ('df', *bound)),
+        textwrap.indent(''.join(src), '    '),
+    )
+    namespace = {}
+    exec(compile(factory_src, '<wrap_with_calls>', 'exec'), namespace)
+    return namespace['make_decorated_func_wrapper'], tuple(bound)
+
+
 def wrap_with_calls(
     func = None,
     *func_args,
@@ -157,84 +366,98 @@ def wrap_with_calls(
         Callable: The decorated function.
     """
 
-    def list_of_callables(callables):
-        """Ensure the input is an iterable of callables."""
+    def tuple_of_callables(callables):
+        """Ensure the input is a tuple of callables."""
         if callables is None:
-            return list()
+            return ()
+        elif isinstance(callables, (list, tuple, set, frozenset)):
+            return tuple(filter(callable, callables))
         elif callable(callables):
-            return list((callables,))
-        elif hasattr(callables, '__iter__'):
-            return list(callables)
-        else:
+            return (callables,)
+        try:
+            iterator = iter(callables)
+        except TypeError:
             # I dont want exceptions here for dynamic use
-            return list()
+            return ()
             #raise ValueError(f'Parameter "{callables}" '
             #                 'must be a callable '
             #                 'or an iterable of callables.')
+        return tuple(filter(callable, iterator))
     
-    _args = args or tuple()
-    _kwds = kwds or dict()
+    _args = args if args else _EMPTY_TUPLE
+    _kwds = kwds if kwds else _EMPTY_DICT_FROZEN
     
-    @functools.wraps(func)
-    def decorator(decorated_func):
-        @functools.wraps(decorated_func)
-        def decorated_func_wrapper(
-            *decorated_func_args,
-            **decorated_func_kwds
-        ):
-            results = list()
-
-            # first calls
-            for item in list_of_callables(first_call):
-                if callable(item):
-                    cur_result = item(*_args, **_kwds)
-                    if (callable(return_filter_func)
-                        and return_filter_func(cur_result)):
-                        return cur_result
-                    results.append(cur_result)
-
-            # func before decorated_func
-            if callable(func):
-                func_result = func(*func_args, *_args, **_kwds)
-                if (callable(return_filter_func)
-                    and return_filter_func(func_result)):
-                    return func_result
-                results.append(func_result)
-
-            # !!! decorated_func call !!!
-            decorated_func_result = decorated_func(
-                *decorated_func_args,
-                **decorated_func_kwds
+    # everything below is fixed at decoration time
+    _first = tuple_of_callables(first_call)
+    _after = tuple_of_callables(after_call)
+    _func_callable = callable(func)
+    _func_all_args = (*func_args, *_args)
+    _filter = return_filter_func if callable(return_filter_func) else None
+    _reduce = reduce_result_func if callable(reduce_result_func) else None
+    _reduce_op = next((reduce_op for reducer, reduce_op in _INLINE_REDUCERS
+                       if reducer is _reduce), None)
+    
+    if not (_first or _after or _func_callable):
+        # nothing to call around decorated_func and
+        # its result is the only one to filter or reduce
+        return _return_unchanged
+    
+    if _WrapWithCalls is not None:
+        def decorator(decorated_func):
+            return _WrapWithCalls(
+                decorated_func,
+                _first,
+                func if _func_callable else None,
+                _func_all_args,
+                _after,
+                tuple(_args),
+                _kwds,
+                _filter,
+                _reduce,
             )
-            ##TODO: Think about next 2 commented lines...
-            #if return_filter_func(decorated_func_result):
-            #    return decorated_func_result
-            results.append(decorated_func_result)
-
-            # func after decorated_func
-            if callable(func):
-                func_result = func(*func_args, *_args, **_kwds)
-                if (callable(return_filter_func)
-                    and return_filter_func(func_result)):
-                    return func_result
-                results.append(func_result)
-
-            # after calls
-            for item in list_of_callables(after_call):
-                if callable(item):
-                    cur_result = item(*_args, **_kwds)
-                    if (callable(return_filter_func)
-                        and return_filter_func(cur_result)):
-                        return cur_result
-                    results.append(cur_result)
-            
-            # reduce results if specified
-            if callable(reduce_result_func):
-                return functools.reduce(reduce_result_func, results)
-            
-            # general result
-            return decorated_func_result
-        return decorated_func_wrapper
+    else:
+        # wrapper code depends only on the shape of the call chain,
+        # the callables themselves are bound into the wrapper closure
+        _factory, _bound = _wrapper_factory(
+            _shape_len(_first),
+            _func_callable,
+            _shape_len(_after),
+            _shape_len(_args) if _first or _after else 0,
+            _shape_len(_func_all_args) if _func_callable else 0,
+            bool(_kwds),
+            _filter is not None,
+            _reduce is not None,
+            _reduce_op,
+        )
+        _values = {
+            'F': _first[1:],
+            'G': _after,
+            'A': _args,
+            'FA': _func_all_args,
+            'K': _kwds,
+            'fn': func,
+            'flt': _filter,
+            'rdc': _reduce,
+        }
+        # only the unrolled ones are bound by name
+        _values.update((f'f{i}', item)
+                       for i, item in enumerate(_first[:_UNROLL_MAX]))
+        _values.update((f'g{i}', item)
+                       for i, item in enumerate(_after[:_UNROLL_MAX]))
+        _values.update((f'A{i}', arg)
+                       for i, arg in enumerate(_args[:_UNROLL_MAX]))
+        _values.update((f'FA{i}', arg)
+                       for i, arg in enumerate(_func_all_args[:_UNROLL_MAX]))
+        _bound_values = tuple(_values[name] for name in _bound)
+    
+        def decorator(decorated_func):
+            return functools.wraps(decorated_func)(
+                _factory(decorated_func, *_bound_values)
+            )
+    
+    if _func_callable:
+        # bare @wrap_with_calls use: decorator replaces func
+        decorator = functools.wraps(func)(decorator)
     return decorator
 
 
@@ -255,7 +478,7 @@ def wrap_with(
     return wrap_with_calls(
         first_call=func_before,
         after_call=func_after,
-        args=(*func_args, *(args or tuple())),
+        args=(*func_args, *(args or _EMPTY_TUPLE)),
         kwds=kwds,
         return_filter_func=return_filter_func,
         reduce_result_func=reduce_result_func,
@@ -276,7 +499,7 @@ def call_before(
     """
     return wrap_with_calls(
         first_call=func,
-        args=(*func_args, *(args or tuple())),
+        args=(*func_args, *(args or _EMPTY_TUPLE)),
         kwds=kwds,
         return_filter_func=return_filter_func,
         reduce_result_func=reduce_result_func,
@@ -297,7 +520,7 @@ def call_after(
     """
     return wrap_with_calls(
         after_call=func,
-        args=(*func_args, *(args or tuple())),
+        args=(*func_args, *(args or _EMPTY_TUPLE)),
         kwds=kwds,
         return_filter_func=return_filter_func,
         reduce_result_func=reduce_result_func,